@@ -1,14 +1,25 @@
+import hashlib
 import json
+import logging
 import os
+import threading
 import smbclient
 import io
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from io import BytesIO
-from typing import Any, Collection
+from typing import Any, Callable, Collection, Iterable
 from pathlib import PureWindowsPath
 
+CHECKSUM_CHUNK_SIZE = 1024 * 1024  # Bytes read per request when streaming a file for hashing
+CHECKSUM_MAX_WORKERS = 8  # Files hashed concurrently by checksum_many/find_duplicates
+CHECKSUM_SAVE_EVERY_FILES = 10_000  # Save the checksum cache after this many new digests...
+CHECKSUM_SAVE_EVERY_BYTES = 10 * 1024 ** 3  # ...or after this many bytes hashed, whichever comes first
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class FileInfo:
@@ -34,12 +45,19 @@ class FileInfo:
         return hash((self.name, self.folder, self.size, self.last_modified))
 
 class nkSMBClient:
-    def __init__(self, server, share, username, password):
+    def __init__(self, server, share, username, password, checksum_cache_path: str | None = None):
         self.server = server
         self.share = share
         self.username = username
         self.password = password
         self.files = None
+        self.checksum_cache_path = checksum_cache_path
+        self._checksum_cache: dict[str, dict[str, Any]] | None = None
+        self._checksum_cache_dirty = False
+        self._checksum_unsaved_files = 0
+        self._checksum_unsaved_bytes = 0
+        self._checksum_cache_lock = threading.Lock()
+        self.skipped_files: dict[str, str] = {}  # Path -> error from the last checksum_many/find_duplicates
 
         smbclient.ClientConfig(
             username=self.username,
@@ -406,4 +424,385 @@ class nkSMBClient:
             else:
                 smbclient.remove(full_path)
 
-        smbclient.rmdir(smb_path)
\ No newline at end of file
+        smbclient.rmdir(smb_path)
+
+    def _file_info(self, file_path_in_share: str) -> FileInfo:
+        """Stat a single file and return its FileInfo (folder is the full parent path in the share)."""
+        st = smbclient.stat(self._smb_path(file_path_in_share))
+        path = PureWindowsPath(file_path_in_share)
+        folder = str(path.parent) if str(path.parent) != "." else ""
+        return FileInfo(
+            name=path.name,
+            folder=folder,
+            size=st.st_size,
+            creation_time=datetime.fromtimestamp(st.st_ctime) if st.st_ctime else None,
+            last_modified=datetime.fromtimestamp(st.st_mtime) if st.st_mtime else None,
+            is_dir=False,
+            full_share_path=folder,
+        )
+
+    def _folder_in_share(self, info: FileInfo) -> str:
+        """Folder of a FileInfo relative to the share ("" at the root of the share)."""
+        # Prefer the full folder path: list_files only puts the nearest folder name in FileInfo.folder
+        folder = info.full_share_path if info.full_share_path is not None else info.folder
+        # list_files leaves "\\server\share" as full_share_path for entries at the root of the share
+        prefix = fr"\\{self.server}\{self.share}"
+        if folder.lower() == prefix.lower():
+            return ""
+        if folder.lower().startswith(f"{prefix}\\".lower()):
+            folder = folder[len(prefix) + 1:]
+        return folder.strip("\\")
+
+    def _path_in_share(self, info: FileInfo) -> str:
+        folder = self._folder_in_share(info)
+        return fr"{folder}\{info.name}" if folder else info.name
+
+    def _checksum_cache_key(self, info: FileInfo) -> str:
+        return json.dumps([self.server, self.share, self._folder_in_share(info), info.name])
+
+    @staticmethod
+    def _checksum_identity(info: FileInfo) -> dict[str, Any]:
+        # A POSIX timestamp, unlike isoformat() of a naive datetime, keeps the DST fold
+        return {
+            "size": info.size,
+            "last_modified": info.last_modified.timestamp() if info.last_modified else None,
+        }
+
+    @staticmethod
+    def _check_checksum_algorithm(algorithm: str) -> None:
+        if hashlib.new(algorithm).digest_size == 0:
+            raise ValueError(f"Checksum algorithm {algorithm!r} has a variable-length digest and is not supported")
+
+    def _load_checksum_cache(self) -> dict[str, dict[str, Any]]:
+        with self._checksum_cache_lock:
+            if self._checksum_cache is None:
+                self._checksum_cache = {}
+                if self.checksum_cache_path and os.path.exists(self.checksum_cache_path):
+                    try:
+                        with open(self.checksum_cache_path, "r", encoding="utf-8") as f:
+                            data = json.load(f)
+                    except Exception as e:
+                        logger.warning("Discarding unreadable checksum cache %s: %s", self.checksum_cache_path, e)
+                        data = {}
+                    if isinstance(data, dict):
+                        self._checksum_cache = data
+                    else:
+                        logger.warning("Discarding checksum cache %s: expected a JSON object", self.checksum_cache_path)
+            return self._checksum_cache
+
+    def save_checksum_cache(self) -> None:
+        """
+        Write the checksum cache to checksum_cache_path.
+
+        checksum() saves when it finishes; checksum_many and find_duplicates save
+        periodically while hashing and once at the end. Does nothing when there are
+        no new digests.
+        """
+        if not self.checksum_cache_path or self._checksum_cache is None:
+            return
+        with self._checksum_cache_lock:
+            if not self._checksum_cache_dirty:
+                return
+            tmp_path = f"{self.checksum_cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._checksum_cache, f)
+            os.replace(tmp_path, self.checksum_cache_path)
+            self._checksum_cache_dirty = False
+            self._checksum_unsaved_files = 0
+            self._checksum_unsaved_bytes = 0
+
+    def _save_checksum_cache_if_due(self) -> None:
+        """Save mid-run, so a killed overnight job keeps the digests computed so far."""
+        with self._checksum_cache_lock:
+            due = (
+                self._checksum_unsaved_files >= CHECKSUM_SAVE_EVERY_FILES
+                or self._checksum_unsaved_bytes >= CHECKSUM_SAVE_EVERY_BYTES
+            )
+        if due:
+            self.save_checksum_cache()
+
+    @staticmethod
+    def _head_bytes(info: FileInfo, max_bytes: int | None) -> int | None:
+        """None when the head covers the whole file, so it shares the full digest."""
+        if max_bytes is not None and info.size is not None and info.size <= max_bytes:
+            return None
+        return max_bytes
+
+    def _cached_checksum(self, info: FileInfo, algorithm: str, max_bytes: int | None = None) -> str | None:
+        max_bytes = self._head_bytes(info, max_bytes)
+        field, name = ("digests", algorithm) if max_bytes is None else ("heads", f"{algorithm}:{max_bytes}")
+        cache = self._load_checksum_cache()
+        with self._checksum_cache_lock:
+            entry = cache.get(self._checksum_cache_key(info))
+            if not isinstance(entry, dict) or not isinstance(entry.get(field), dict):
+                return None
+            if entry.get("size") != info.size or entry.get("last_modified") != self._checksum_identity(info)["last_modified"]:
+                return None
+            return entry[field].get(name)
+
+    def _store_checksum(self, info: FileInfo, algorithm: str, value: str, max_bytes: int | None = None) -> None:
+        max_bytes = self._head_bytes(info, max_bytes)
+        field, name = ("digests", algorithm) if max_bytes is None else ("heads", f"{algorithm}:{max_bytes}")
+        cache = self._load_checksum_cache()
+        identity = self._checksum_identity(info)
+        key = self._checksum_cache_key(info)
+        with self._checksum_cache_lock:
+            entry = cache.get(key)
+            if (
+                not isinstance(entry, dict)
+                or not isinstance(entry.get("digests"), dict)
+                or {"size": entry.get("size"), "last_modified": entry.get("last_modified")} != identity
+            ):
+                # New or modified file: replace the stale entry instead of adding next to it
+                entry = {**identity, "digests": {}}
+                cache[key] = entry
+            if not isinstance(entry.get(field), dict):
+                entry[field] = {}
+            entry[field][name] = value
+            self._checksum_cache_dirty = True
+            self._checksum_unsaved_files += 1
+            self._checksum_unsaved_bytes += (info.size or 0) if max_bytes is None else max_bytes
+
+    def _prune_checksum_cache(self, path_in_share: str, files: list[FileInfo]) -> None:
+        """Drop cache entries below path_in_share for files that are no longer listed."""
+        cache = self._load_checksum_cache()
+        root = path_in_share.strip("\\").lower()
+        listed = {self._checksum_cache_key(info) for info in files}
+        with self._checksum_cache_lock:
+            for key in list(cache):
+                try:
+                    server, share, folder, name = json.loads(key)
+                except Exception:
+                    continue
+                if server != self.server or share != self.share or key in listed:
+                    continue
+                folder = folder.lower()
+                if not root or folder == root or folder.startswith(f"{root}\\"):
+                    del cache[key]
+                    self._checksum_cache_dirty = True
+
+    def _hash_file(
+        self,
+        file_path_in_share: str,
+        algorithm: str,
+        chunk_size: int = CHECKSUM_CHUNK_SIZE,
+        max_bytes: int | None = None,
+    ) -> str:
+        """Stream a file from the share through hashlib, optionally stopping after max_bytes."""
+        digest = hashlib.new(algorithm)
+        remaining = max_bytes
+        smb_path = self._smb_path(file_path_in_share)
+        with smbclient.open_file(smb_path, mode="rb") as f:
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+        return digest.hexdigest()
+
+    def _checksum_with_info(
+        self,
+        file_path_in_share: str,
+        info: FileInfo | None,
+        algorithm: str,
+        chunk_size: int,
+        max_bytes: int | None = None,
+    ) -> str:
+        if info is None:
+            info = self._file_info(file_path_in_share)
+        max_bytes = self._head_bytes(info, max_bytes)
+        cached = self._cached_checksum(info, algorithm, max_bytes)
+        if cached is None:
+            cached = self._hash_file(file_path_in_share, algorithm, chunk_size=chunk_size, max_bytes=max_bytes)
+            self._store_checksum(info, algorithm, cached, max_bytes)
+        return cached
+
+    def _checksum_infos(
+        self,
+        items: list[tuple[str, FileInfo | None]],
+        algorithm: str,
+        max_workers: int,
+        chunk_size: int,
+        max_bytes: int | None = None,
+    ) -> dict[str, str | None]:
+        def _worker(item: tuple[str, FileInfo | None]) -> tuple[str, str | None]:
+            path, info = item
+            try:
+                value = self._checksum_with_info(path, info, algorithm, chunk_size, max_bytes)
+                self._save_checksum_cache_if_due()
+                return path, value
+            except Exception as e:
+                logger.warning("Skipping checksum of %s: %s", path, e)
+                with self._checksum_cache_lock:
+                    self.skipped_files[path] = str(e)
+                return path, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(executor.map(_worker, items))
+
+    def checksum(
+        self,
+        file_path_in_share: str,
+        *,
+        algorithm: str = "sha256",
+        chunk_size: int = CHECKSUM_CHUNK_SIZE,
+    ) -> str:
+        """
+        Return the hex digest of a file on the share without downloading it to disk.
+
+        The content is streamed in chunks. Results are cached by FileInfo identity
+        (name, folder, size, last_modified), so an unchanged file is never re-hashed.
+        Pass checksum_cache_path to the constructor to persist the cache between runs;
+        a new digest is written to it before returning. Use checksum_many for many
+        files, which saves in batches instead of once per file.
+
+        Args:
+            file_path_in_share: File path relative to the share (e.g. "Tools\\data\\file.csv").
+            algorithm: A fixed-length hashlib algorithm (e.g. "sha256", "md5", "blake2b").
+                Variable-length digests (shake_128, shake_256) raise ValueError.
+            chunk_size: Bytes read per request while streaming.
+
+        Returns:
+            The hex digest of the file content.
+        """
+        self._check_checksum_algorithm(algorithm)
+        try:
+            return self._checksum_with_info(file_path_in_share, None, algorithm, chunk_size)
+        finally:
+            self.save_checksum_cache()
+
+    def checksum_many(
+        self,
+        file_paths_in_share: Iterable[str],
+        *,
+        algorithm: str = "sha256",
+        max_workers: int = CHECKSUM_MAX_WORKERS,
+        chunk_size: int = CHECKSUM_CHUNK_SIZE,
+    ) -> dict[str, str | None]:
+        """
+        Hash several files on the share concurrently.
+
+        The checksum cache is saved every CHECKSUM_SAVE_EVERY_FILES new digests or
+        CHECKSUM_SAVE_EVERY_BYTES hashed, and once more at the end.
+
+        Args:
+            file_paths_in_share: File paths relative to the share.
+            algorithm: A fixed-length hashlib algorithm (e.g. "sha256", "md5", "blake2b").
+                Variable-length digests (shake_128, shake_256) raise ValueError.
+            max_workers: Number of files streamed at the same time.
+            chunk_size: Bytes read per request while streaming.
+
+        Returns:
+            Dict of path -> hex digest. Files that could not be read map to None and
+            are listed with their error in self.skipped_files.
+        """
+        self._check_checksum_algorithm(algorithm)
+        self.skipped_files = {}
+        items = [(path, None) for path in dict.fromkeys(file_paths_in_share)]
+        try:
+            return self._checksum_infos(items, algorithm, max_workers, chunk_size)
+        finally:
+            self.save_checksum_cache()
+
+    def find_duplicates(
+        self,
+        path_in_share: str,
+        *,
+        algorithm: str = "sha256",
+        max_workers: int = CHECKSUM_MAX_WORKERS,
+        chunk_size: int = CHECKSUM_CHUNK_SIZE,
+        max_depth: int | None = None,
+        min_size: int = 1,
+    ) -> dict[str, list[FileInfo]]:
+        """
+        Find files with identical content below a directory on the share.
+
+        Files are grouped by size first, so a file with a unique size is never read.
+        Within each size group only the first chunk is hashed, and only files that
+        still collide are hashed in full. Both digests are kept in the checksum cache,
+        so an unchanged file is not reopened on the next run. The cache is saved
+        periodically while hashing. When max_depth is None, cache entries for files
+        no longer found below path_in_share are removed.
+
+        Args:
+            path_in_share: Directory relative to the share (e.g. "Archive", "" for the whole share).
+            algorithm: A fixed-length hashlib algorithm (e.g. "sha256", "md5", "blake2b").
+                Variable-length digests (shake_128, shake_256) raise ValueError.
+            max_workers: Number of files streamed at the same time.
+            chunk_size: Bytes read per request while streaming; also the size of the pre-check.
+            max_depth: Passed to list_files (None = unlimited).
+            min_size: Ignore files smaller than this many bytes (default skips empty files).
+
+        Returns:
+            Dict of hex digest -> list of FileInfo, only for groups with two or more files.
+            Files that could not be read are left out and listed with their error in
+            self.skipped_files (keyed by path relative to the share).
+        """
+        self._check_checksum_algorithm(algorithm)
+        self.skipped_files = {}
+        files = self.list_files(
+            path_in_share,
+            files_only=True,
+            recursive=True,
+            max_depth=max_depth,
+            include_metadata=True,
+        )
+        # list_files returns [] on any error, so never treat an empty listing as "everything was deleted"
+        if files and max_depth is None:
+            self._prune_checksum_cache(path_in_share, files)
+
+        def _group(infos: list[FileInfo], key_of: Callable[[FileInfo], Any]) -> list[list[FileInfo]]:
+            groups: dict[Any, list[FileInfo]] = {}
+            for info in infos:
+                key = key_of(info)
+                if key is not None:
+                    groups.setdefault(key, []).append(info)
+            return [group for group in groups.values() if len(group) > 1]
+
+        def _flatten(groups: list[list[FileInfo]]) -> list[FileInfo]:
+            return [info for group in groups for info in group]
+
+        def _head_key(info: FileInfo) -> tuple[int, str] | None:
+            head = heads.get(self._path_in_share(info))
+            return (info.size, head) if head else None
+
+        def _digest_key(info: FileInfo) -> str | None:
+            return digests.get(self._path_in_share(info))
+
+        try:
+            candidates = [info for info in files if info.size is not None and info.size >= min_size]
+            candidates = _flatten(_group(candidates, lambda info: info.size))
+
+            # Unchanged files keep their cached digests and are never reopened
+            digests: dict[str, str | None] = {}
+            heads: dict[str, str | None] = {}
+            for info in candidates:
+                path = self._path_in_share(info)
+                digests[path] = self._cached_checksum(info, algorithm)
+                heads[path] = self._cached_checksum(info, algorithm, max_bytes=chunk_size)
+            unknown = [info for info in candidates if _digest_key(info) is None and _head_key(info) is None]
+
+            # Cheap pre-check on the first chunk, so large files with a unique start are never read in full
+            heads.update(self._checksum_infos(
+                [(self._path_in_share(info), info) for info in unknown],
+                algorithm, max_workers, chunk_size, max_bytes=chunk_size,
+            ))
+
+            # A file with only a cached full digest (e.g. from checksum()) has no first chunk to compare,
+            # so files without a full digest in its size group can only be compared by their full digest
+            sizes_without_head = {info.size for info in candidates if _head_key(info) is None and _digest_key(info)}
+            colliding = {self._path_in_share(info) for info in _flatten(_group(candidates, _head_key))}
+            full = [
+                info
+                for info in candidates
+                if _digest_key(info) is None
+                and (info.size in sizes_without_head or self._path_in_share(info) in colliding)
+            ]
+            digests.update(self._checksum_infos(
+                [(self._path_in_share(info), info) for info in full], algorithm, max_workers, chunk_size
+            ))
+            return {_digest_key(group[0]): group for group in _group(candidates, _digest_key)}
+        finally:
+            self.save_checksum_cache()
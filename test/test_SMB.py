@@ -245,3 +245,34 @@ class TestSMB(unittest.TestCase):
 
         client.delete_directory(smb_dir_path_in_share=self.new_dir_in_share)
         
+
+    def test_checksum(self):
+        client = nkSMBClient(server=self.server, share=self.share, username=self.user, password=self.pwd)
+        files = client.list_files(path_in_share=self.path_in_share, files_only=True)
+        paths = [fr"{self.path_in_share}\{name}" for name in files]
+
+        expected = hashlib.sha256(client.read_bytes(paths[0])).hexdigest()
+        self.assertTrue(client.checksum(paths[0]) == expected)
+
+        checksums = client.checksum_many(paths, algorithm="md5")
+        print(checksums)
+        self.assertTrue(len(checksums) == len(paths))
+        self.assertTrue(checksums[paths[0]] == hashlib.md5(client.read_bytes(paths[0])).hexdigest())
+
+    def test_find_duplicates(self):
+        client = nkSMBClient(server=self.server, share=self.share, username=self.user, password=self.pwd)
+        files = client.list_files(path_in_share=self.path_in_share, files_only=True)
+        source_file = fr"{self.path_in_share}\{files[0]}"
+        local_file_path = fr"{self.local_tmp_folder}/{files[0]}"
+        client.download_file(source_file, local_file_path=local_file_path)
+        client.upload_file(local_file=local_file_path, smb_file_path_in_share=fr"{self.new_dir_in_share}\{files[0]}", create_folders_if_not_exist=True)
+        os.remove(local_file_path)
+
+        duplicates = client.find_duplicates(path_in_share=self.path_in_share)
+        print(duplicates)
+        self.assertTrue(len(duplicates) == 1)
+        group = next(iter(duplicates.values()))
+        self.assertTrue(len(group) == 2)
+        self.assertTrue(all(fileinfo.name == files[0] for fileinfo in group))
+
+        client.delete_directory(smb_dir_path_in_share=self.new_dir_in_share)
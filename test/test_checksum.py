@@ -0,0 +1,254 @@
+import hashlib
+import io
+import json
+import ntpath
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from NKSMBClient.src import nkSMBClient as nkSMBClient_module
+from NKSMBClient.src.nkSMBClient import FileInfo, nkSMBClient
+
+SERVER = "srv"
+SHARE = "sh"
+MTIME = 1_700_000_000
+
+
+class FakeSMBClient:
+    """In-memory stand-in for the smbclient module that records every open_file call."""
+
+    def __init__(self, shares: dict[str, dict[str, bytes]]):
+        self.shares = shares
+        self.mtimes = {(share, path): MTIME for share, files in shares.items() for path in files}
+        self.opened: list[str] = []
+        self.on_open = None
+        # smbclient builds entry.path as rf"{path}\{name}"; ntpath.join turns "\\srv\sh\" + name into "\\srv\sh\name"
+        self.join_entry_path = lambda smb_path, name: f"{smb_path}\\{name}"
+
+    def _split(self, smb_path: str) -> tuple[str, str]:
+        # Expect exactly one \\server\share prefix, like a real SMB path
+        parts = smb_path.split("\\")
+        if parts[:3] != ["", "", SERVER] or len(parts) < 4 or SERVER in parts[3:]:
+            raise FileNotFoundError(smb_path)
+        return parts[3], "\\".join(part for part in parts[4:] if part)
+
+    def _stat(self, share: str, path: str) -> SimpleNamespace:
+        if path in self.shares[share]:
+            mtime = self.mtimes[(share, path)]
+            return SimpleNamespace(st_size=len(self.shares[share][path]), st_ctime=mtime, st_mtime=mtime)
+        return SimpleNamespace(st_size=0, st_ctime=MTIME, st_mtime=MTIME)
+
+    def ClientConfig(self, **kwargs):
+        pass
+
+    def stat(self, smb_path: str) -> SimpleNamespace:
+        share, path = self._split(smb_path)
+        if path not in self.shares.get(share, {}):
+            raise FileNotFoundError(smb_path)
+        return self._stat(share, path)
+
+    def open_file(self, smb_path: str, mode: str = "rb") -> io.BytesIO:
+        share, path = self._split(smb_path)
+        if path not in self.shares.get(share, {}):
+            raise FileNotFoundError(smb_path)
+        self.opened.append(path)
+        if self.on_open:
+            self.on_open(path)
+        return io.BytesIO(self.shares[share][path])
+
+    def scandir(self, smb_path: str) -> list[SimpleNamespace]:
+        share, folder = self._split(smb_path)
+        prefix = f"{folder}\\" if folder else ""
+        children: dict[str, bool] = {}
+        for path in self.shares[share]:
+            if path.startswith(prefix):
+                parts = path[len(prefix):].split("\\")
+                children[parts[0]] = len(parts) > 1
+        return [
+            SimpleNamespace(
+                name=name,
+                path=self.join_entry_path(smb_path, name),
+                is_file=lambda is_dir=is_dir: not is_dir,
+                is_dir=lambda is_dir=is_dir: is_dir,
+                stat=lambda path=f"{prefix}{name}": self._stat(share, path),
+            )
+            for name, is_dir in children.items()
+        ]
+
+
+class TestChecksum(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "checksums.json")
+        self.files = {
+            "root.bin": b"a" * 3000,
+            r"Archive\copy.bin": b"a" * 3000,
+            r"Archive\same_size_other_start.bin": b"b" + b"a" * 2999,
+            r"Archive\same_size_other_end.bin": b"a" * 2999 + b"b",
+            r"Archive\unique_size.bin": b"a" * 10,
+            r"Archive\empty.bin": b"",
+        }
+        self.share = FakeSMBClient({SHARE: self.files, "other": {"root.bin": b"c" * 3000}})
+        patcher = mock.patch("NKSMBClient.src.nkSMBClient.smbclient", self.share)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _client(self, share: str = SHARE) -> nkSMBClient:
+        return nkSMBClient(server=SERVER, share=share, username="user", password="pwd", checksum_cache_path=self.cache_path)
+
+    def test_checksum_matches_hashlib_and_is_cached(self):
+        client = self._client()
+        self.assertEqual(client.checksum(r"Archive\copy.bin"), hashlib.sha256(b"a" * 3000).hexdigest())
+        self.assertEqual(client.checksum(r"Archive\copy.bin", algorithm="md5"), hashlib.md5(b"a" * 3000).hexdigest())
+        client.checksum(r"Archive\copy.bin")
+        self.assertEqual(len(self.share.opened), 2)
+
+    def test_checksum_rejects_variable_length_digest(self):
+        client = self._client()
+        with self.assertRaises(ValueError):
+            client.checksum("root.bin", algorithm="shake_128")
+        with self.assertRaises(ValueError):
+            client.checksum_many(["root.bin"], algorithm="shake_256")
+        self.assertEqual(self.share.opened, [])
+
+    def test_checksum_many_reports_skipped_files(self):
+        client = self._client()
+        with self.assertLogs("NKSMBClient.src.nkSMBClient", level="WARNING"):
+            result = client.checksum_many(["root.bin", r"Archive\missing.bin"])
+        self.assertEqual(result["root.bin"], hashlib.sha256(b"a" * 3000).hexdigest())
+        self.assertIsNone(result[r"Archive\missing.bin"])
+        self.assertEqual(list(client.skipped_files), [r"Archive\missing.bin"])
+
+    def test_persistent_cache_is_not_rehashed(self):
+        self._client().checksum_many(["root.bin", r"Archive\copy.bin"])
+        self.assertEqual(len(self.share.opened), 2)
+
+        self._client().checksum_many(["root.bin", r"Archive\copy.bin"])
+        self.assertEqual(len(self.share.opened), 2)
+
+        # A modified file is re-hashed and replaces its stale cache entry
+        self.share.mtimes[(SHARE, "root.bin")] += 60
+        self._client().checksum_many(["root.bin"])
+        self.assertEqual(len(self.share.opened), 3)
+        with open(self.cache_path, encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    def test_cache_is_scoped_per_share(self):
+        # Same path, size and mtime on another share must not reuse the digest
+        self._client().checksum_many(["root.bin"])
+        result = self._client(share="other").checksum_many(["root.bin"])
+        self.assertEqual(result["root.bin"], hashlib.sha256(b"c" * 3000).hexdigest())
+        self.assertEqual(len(self.share.opened), 2)
+
+    def test_invalid_cache_file_is_discarded(self):
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump(["not", "a", "dict"], f)
+        client = self._client()
+        with self.assertLogs("NKSMBClient.src.nkSMBClient", level="WARNING"):
+            self.assertEqual(client.checksum("root.bin"), hashlib.sha256(b"a" * 3000).hexdigest())
+
+    def test_checksum_is_persisted_for_a_new_client(self):
+        self.assertEqual(self._client().checksum("root.bin"), hashlib.sha256(b"a" * 3000).hexdigest())
+        self.assertEqual(self._client().checksum("root.bin"), hashlib.sha256(b"a" * 3000).hexdigest())
+        self.assertEqual(self.share.opened, ["root.bin"])
+
+    def test_checksum_many_saves_while_hashing(self):
+        # Simulate a job killed while hashing the last file: earlier digests must already be on disk
+        on_disk = []
+
+        def _read_cache(path):
+            if path == r"Archive\same_size_other_end.bin" and os.path.exists(self.cache_path):
+                with open(self.cache_path, encoding="utf-8") as f:
+                    on_disk.extend(json.loads(key)[3] for key in json.load(f))
+
+        self.share.on_open = _read_cache
+        with mock.patch.object(nkSMBClient_module, "CHECKSUM_SAVE_EVERY_FILES", 2):
+            self._client().checksum_many(
+                ["root.bin", r"Archive\copy.bin", r"Archive\same_size_other_end.bin"], max_workers=1
+            )
+        self.assertEqual(sorted(on_disk), ["copy.bin", "root.bin"])
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "needs time.tzset")
+    def test_checksum_identity_keeps_dst_fold(self):
+        old_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "Europe/Copenhagen"
+        time.tzset()
+        try:
+            first = datetime(2025, 10, 26, 2, 30, fold=0)
+            second = datetime(2025, 10, 26, 2, 30, fold=1)
+            identities = [
+                nkSMBClient._checksum_identity(FileInfo("a.bin", "", 10, None, last_modified))
+                for last_modified in (first, second)
+            ]
+            self.assertNotEqual(identities[0], identities[1])
+        finally:
+            if old_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = old_tz
+            time.tzset()
+
+    def test_folder_in_share_strips_unc_prefix(self):
+        client = self._client()
+        for full_share_path, expected in [(r"\\srv\sh", ""), (r"\\srv\sh" + "\\", ""), ("", ""), (r"\\srv\sh\Archive", "Archive"), ("Archive", "Archive")]:
+            info = FileInfo("root.bin", "sh", 3000, None, None, full_share_path=full_share_path)
+            self.assertEqual(client._folder_in_share(info), expected)
+
+    def test_find_duplicates_includes_root_and_prechecks_by_size_and_head(self):
+        client = self._client()
+        duplicates = client.find_duplicates("", chunk_size=1000)
+
+        self.assertEqual(list(duplicates), [hashlib.sha256(b"a" * 3000).hexdigest()])
+        group = next(iter(duplicates.values()))
+        self.assertEqual(sorted(client._path_in_share(info) for info in group), [r"Archive\copy.bin", "root.bin"])
+        self.assertEqual(client.skipped_files, {})
+        # Files with a unique size are never opened; a different first chunk stops after the head
+        self.assertNotIn(r"Archive\unique_size.bin", self.share.opened)
+        self.assertNotIn(r"Archive\empty.bin", self.share.opened)
+        self.assertEqual(self.share.opened.count(r"Archive\same_size_other_start.bin"), 1)
+
+        # First-chunk digests live in the file's own entry, not in extra cache keys
+        with open(self.cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+        self.assertEqual(len(cache), 4)
+
+        # An unchanged second run reopens nothing
+        opened = len(self.share.opened)
+        self.assertEqual(self._client().find_duplicates("", chunk_size=1000), duplicates)
+        self.assertEqual(len(self.share.opened), opened)
+
+    def test_find_duplicates_with_unc_root_folder(self):
+        # Entry paths without the doubled backslash leave "\\srv\sh" as full_share_path for root files
+        self.share.join_entry_path = ntpath.join
+        client = self._client()
+        files = client.list_files("", files_only=True, recursive=True, include_metadata=True)
+        self.assertIn(r"\\srv\sh", [info.full_share_path for info in files])
+
+        duplicates = client.find_duplicates("", chunk_size=1000)
+        group = next(iter(duplicates.values()))
+        self.assertEqual(sorted(client._path_in_share(info) for info in group), [r"Archive\copy.bin", "root.bin"])
+        self.assertEqual(client.skipped_files, {})
+
+    def test_find_duplicates_uses_digests_from_checksum(self):
+        # root.bin has only a full digest (no first chunk), so same-size files are hashed in full
+        self._client().checksum("root.bin")
+        duplicates = self._client().find_duplicates("", chunk_size=1000)
+        self.assertEqual(len(next(iter(duplicates.values()))), 2)
+        self.assertEqual(self.share.opened.count("root.bin"), 1)
+
+    def test_find_duplicates_prunes_deleted_files(self):
+        self._client().find_duplicates("", chunk_size=1000)
+        del self.files[r"Archive\same_size_other_end.bin"]
+        self._client().find_duplicates("", chunk_size=1000)
+        with open(self.cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+        self.assertEqual(sorted(json.loads(key)[3] for key in cache), ["copy.bin", "root.bin", "same_size_other_start.bin"])
+
+
+if __name__ == "__main__":
+    unittest.main()